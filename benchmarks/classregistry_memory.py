@@ -0,0 +1,84 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Memory benchmark for the class registries
+
+A large amount of classes is created and registered under dotted paths, which
+are computed like the code browser does, spread over a number of modules.
+Two numbers are reported for each registry type:
+
+- the memory used by the registry itself, while all classes are still
+  referenced elsewhere, and
+
+- the memory still in use after all other references to the classes were
+  dropped, which includes the classes kept alive by the registry.
+
+Both registries use about the same memory while the classes are alive; the
+weak registry only saves the memory of the classes that are not used anymore.
+
+Usage: python benchmarks/classregistry_memory.py [--classes N] [--modules N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from zope.apidoc.classregistry import ClassRegistry
+from zope.apidoc.classregistry import WeakClassRegistry
+
+
+def createClasses(count, modules):
+    classes = []
+    for i in range(count):
+        klass = type('Class%i' % i, (object,), {})
+        klass.__module__ = 'zope.apidoc.benchmark.module%i' % (i % modules)
+        classes.append(klass)
+    return classes
+
+
+def measure(factory, count, modules):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    classes = createClasses(count, modules)
+    before = tracemalloc.get_traced_memory()[0]
+    registry = factory()
+    for klass in classes:
+        registry[klass.__module__ + '.' + klass.__name__] = klass
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    del classes, klass
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - start
+    length = len(registry)
+    tracemalloc.stop()
+    return used, retained, length
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--classes', type=int, default=100000)
+    parser.add_argument('--modules', type=int, default=1000)
+    options = parser.parse_args(args)
+
+    print('{} classes in {} modules'.format(options.classes, options.modules))
+    print('{:<20} {:>12} {:>12} {:>10}'.format(
+        'registry', 'used', 'retained', 'entries'))
+    for factory in (ClassRegistry, WeakClassRegistry):
+        used, retained, length = measure(
+            factory, options.classes, options.modules)
+        print('{:<20} {:>9.1f} MB {:>9.1f} MB {:>10}'.format(
+            factory.__name__, used / 1e6, retained / 1e6, length))
+
+
+if __name__ == '__main__':
+    main()
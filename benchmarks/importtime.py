@@ -0,0 +1,108 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Import time benchmark for the zope.apidoc modules
+
+Every module is imported in a fresh interpreter started with
+``-X importtime``. The cumulative import time of the module is reported,
+together with its most expensive top-level dependencies. Modules already
+imported during interpreter startup are ignored.
+
+Usage: python benchmarks/importtime.py [--repeat N] [--top N] [module ...]
+"""
+import argparse
+import subprocess
+import sys
+
+
+MODULES = [
+    'zope.apidoc.classregistry',
+    'zope.apidoc.utilities',
+    'zope.apidoc.interface',
+    'zope.apidoc.component',
+    'zope.apidoc.presentation',
+]
+
+
+def parseImportTimes(output):
+    """Parse the output of ``-X importtime``.
+
+    Returns a dictionary mapping module names to tuples of the self and the
+    cumulative import time in microseconds.
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            self, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+        times[fields[2].strip()] = (self, cumulative)
+    return times
+
+
+def measure(module=None):
+    """Import the module in a fresh interpreter and return its times.
+
+    If no module is given, the modules imported during startup are
+    measured.
+    """
+    code = 'pass' if module is None else 'import ' + module
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    return parseImportTimes(result.stderr)
+
+
+def _isTopLevel(name):
+    # Report the packages in the `zope` namespace individually
+    if name.startswith('zope.'):
+        name = name[len('zope.'):]
+    return '.' not in name
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='imports per module; the fastest one is used')
+    parser.add_argument('--top', type=int, default=5,
+                        help='amount of expensive dependencies to list')
+    options = parser.parse_args(args)
+
+    startup = measure()
+    for module in options.modules:
+        best = None
+        for i in range(options.repeat):
+            times = measure(module)
+            if best is None or times[module][1] < best[module][1]:
+                best = times
+        print('{:<40} {:>10.1f} ms'.format(
+            module, best[module][1] / 1000.0))
+        dependencies = sorted(
+            ((cumulative, name) for name, (self, cumulative) in best.items()
+             if name != module and name not in startup and
+             _isTopLevel(name)),
+            reverse=True)
+        for cumulative, name in dependencies[:options.top]:
+            print('    {:<36} {:>10.1f} ms'.format(name, cumulative / 1000.0))
+
+
+if __name__ == '__main__':
+    main()
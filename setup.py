@@ -49,6 +49,22 @@ setup(
         + '\n\n' +
         read('src', 'zope', 'apidoc', 'classregistry.txt')
         + '\n\n' +
+        read('src', 'zope', 'apidoc', 'diff.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'generation.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'hierarchy.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'query.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'rendercache.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'renderpool.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'search.txt')
+        + '\n\n' +
+        read('src', 'zope', 'apidoc', 'snapshot.txt')
+        + '\n\n' +
         read('CHANGES.txt')
     ),
     license="ZPL 2.1",
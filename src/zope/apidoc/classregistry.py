@@ -14,6 +14,8 @@
 """Class Registry
 """
 import sys
+import weakref
+from collections.abc import MutableMapping
 
 from zope.testing.cleanup import addCleanUp
 
@@ -24,10 +26,61 @@ __import_unknown_modules__ = False
 # TODO: List hard-coded for now.
 IGNORE_MODULES = ['twisted']
 
+_marker = object()
+
 
 class ClassRegistry(dict):
     """A simple registry for classes."""
 
+    # Incremented on every change of the registry
+    generation = 0
+
+    def _changed(self):
+        self.generation += 1
+
+    def __setitem__(self, path, klass):
+        if self.get(path, _marker) is klass:
+            return
+        super().__setitem__(path, klass)
+        self._changed()
+
+    def __delitem__(self, path):
+        super().__delitem__(path)
+        self._changed()
+
+    def clear(self):
+        if self:
+            super().clear()
+            self._changed()
+
+    def pop(self, path, *args):
+        if path not in self:
+            return super().pop(path, *args)
+        result = super().pop(path)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._changed()
+        return result
+
+    def setdefault(self, path, default=None):
+        if path in self:
+            return self[path]
+        super().__setitem__(path, default)
+        self._changed()
+        return default
+
+    def update(self, *args, **kw):
+        changed = False
+        for path, klass in dict(*args, **kw).items():
+            if self.get(path, _marker) is not klass:
+                super().__setitem__(path, klass)
+                changed = True
+        if changed:
+            self._changed()
+
     def getClassesThatImplement(self, iface):
         """Return all class items that implement iface.
 
@@ -45,11 +98,169 @@ class ClassRegistry(dict):
                 if issubclass(klass2, klass) and klass2 is not klass]
 
 
-classRegistry = ClassRegistry()
+class _ClassRef(weakref.ref):
+    """A weak reference to a class, that knows where it is registered."""
+
+    __slots__ = ('module', 'name')
+
+    def __new__(cls, klass, callback, module, name):
+        return super().__new__(cls, klass, callback)
+
+    def __init__(self, klass, callback, module, name):
+        super().__init__(klass, callback)
+        self.module = module
+        self.name = name
+
+
+class WeakClassRegistry(MutableMapping):
+    """A class registry that does not keep its classes alive.
+
+    Classes are referenced weakly and removed from the registry, once they
+    are garbage collected. The dotted paths are split into module and class
+    names.
+
+    The registry does not use less memory than `ClassRegistry` while its
+    classes are alive; it only allows classes that are not used anywhere else
+    to be collected.
+    """
+
+    def __init__(self, *args, **kw):
+        # module name -> {class name: reference}
+        self._modules = {}
+        self._length = 0
+        self._generation = 0
+        # References to collected classes, which are not removed yet
+        self._pendingRemovals = []
+
+        def remove(ref, selfref=weakref.ref(self)):
+            self = selfref()
+            if self is not None:
+                # The callback can run in the middle of any other method, so
+                # the entry is only removed on the next access, like
+                # `weakref.WeakValueDictionary` does.
+                self._pendingRemovals.append(ref)
+
+        self._callback = remove
+        self.update(*args, **kw)
+
+    @property
+    def generation(self):
+        """Incremented on every change of the registry, including the removal
+        of collected classes."""
+        self._commitRemovals()
+        return self._generation
+
+    def _changed(self):
+        self._generation += 1
+
+    def _commitRemovals(self):
+        pending = self._pendingRemovals
+        while pending:
+            ref = pending.pop()
+            names = self._modules.get(ref.module)
+            # The entry might have been replaced meanwhile
+            if names is not None and names.get(ref.name) is ref:
+                self._remove(ref.module, ref.name)
+
+    def _remove(self, module, name):
+        names = self._modules[module]
+        del names[name]
+        if not names:
+            del self._modules[module]
+        self._length -= 1
+        self._changed()
+
+    def __getitem__(self, path):
+        module, dot, name = path.rpartition('.')
+        try:
+            klass = self._modules[module][name]()
+        except KeyError:
+            klass = None
+        if klass is None:
+            raise KeyError(path)
+        return klass
+
+    def __setitem__(self, path, klass):
+        module, dot, name = path.rpartition('.')
+        ref = self._modules.get(module, {}).get(name)
+        if ref is not None and ref() is klass:
+            return
+        module = sys.intern(module)
+        # Share the class name with the class, if possible
+        if name == getattr(klass, '__name__', None):
+            name = klass.__name__
+        else:
+            name = sys.intern(name)
+        self._commitRemovals()
+        names = self._modules.setdefault(module, {})
+        if name not in names:
+            self._length += 1
+        names[name] = _ClassRef(klass, self._callback, module, name)
+        self._changed()
+
+    def __delitem__(self, path):
+        module, dot, name = path.rpartition('.')
+        self._commitRemovals()
+        if name not in self._modules.get(module, ()):
+            raise KeyError(path)
+        self._remove(module, name)
+
+    def __iter__(self):
+        for path, klass in self.items():
+            yield path
+
+    def __len__(self):
+        self._commitRemovals()
+        return self._length
+
+    def clear(self):
+        del self._pendingRemovals[:]
+        if self._modules:
+            self._modules.clear()
+            self._length = 0
+            self._changed()
+
+    def items(self):
+        """Return a list of all (path, class) items of living classes."""
+        items = []
+        # Iterate over copies, since classes might be collected meanwhile
+        for module, names in list(self._modules.items()):
+            prefix = module + '.' if module else ''
+            for name, ref in list(names.items()):
+                klass = ref()
+                if klass is not None:
+                    items.append((prefix + name, klass))
+        return items
+
+    getClassesThatImplement = ClassRegistry.getClassesThatImplement
+    getSubclassesOf = ClassRegistry.getSubclassesOf
+
+
+classRegistry = _defaultClassRegistry = ClassRegistry()
+
+
+def setClassRegistry(registry):
+    """Set the class registry used by the snapshots, the search index and
+    the registry generations.
+
+    For example, a `WeakClassRegistry` does not keep dynamically created
+    classes alive. The registry should be set before any classes are
+    registered. Code using the registry must call `getClassRegistry()`
+    instead of importing `classRegistry`.
+    """
+    global classRegistry
+    classRegistry = registry
+
+
+def getClassRegistry():
+    """Return the class registry in use."""
+    return classRegistry
 
 
 def cleanUp():
     classRegistry.clear()
+    _defaultClassRegistry.clear()
+    setClassRegistry(_defaultClassRegistry)
 
 
 addCleanUp(cleanUp)
@@ -17,14 +17,15 @@ import base64
 import types
 
 import zope.interface.declarations
-from zope.component import getGlobalSiteManager
 from zope.component.interfaces import IFactory
 from zope.i18nmessageid import ZopeMessageFactory as _
 from zope.interface import Interface
 from zope.interface.interface import InterfaceClass
-from zope.publisher.interfaces import IRequest
+from zope.testing.cleanup import addCleanUp
 
-from zope.apidoc.classregistry import classRegistry
+from zope.apidoc.hierarchy import interfaceHierarchy
+from zope.apidoc.snapshot import getSnapshot
+from zope.apidoc.utilities import getFileSnippet
 from zope.apidoc.utilities import getPythonPath
 from zope.apidoc.utilities import isReferencable
 from zope.apidoc.utilities import relativizePath
@@ -36,47 +37,74 @@ SPECIFIC_INTERFACE_LEVEL = 1
 EXTENDED_INTERFACE_LEVEL = 2
 GENERIC_INTERFACE_LEVEL = 4
 
+# The registry snapshot and the index of its utilities by interface id and
+# URL name
+_utilityIndex = (None, {})
+
+
+def cleanUp():
+    global _utilityIndex
+    _utilityIndex = (None, {})
+
+
+addCleanUp(cleanUp)
+
 
 def encodeUtilityName(name):
     return base64.urlsafe_b64encode(name.encode('utf-8')).decode()
 
 
-def _adapterishRegistrations(registry):
-    yield from registry.registeredAdapters()
-    yield from registry.registeredSubscriptionAdapters()
-    yield from registry.registeredHandlers()
+def _getInterfaceId(iface):
+    return '{}.{}'.format(iface.__module__, iface.getName())
+
+
+def _getUtilityURLName(reg):
+    return encodeUtilityName(reg.name or '__noname__')
+
+
+def _adapterishRegistrations(snapshot):
+    yield from snapshot.adapters
+    yield from snapshot.subscriptionAdapters
+    yield from snapshot.handlers
 
 
 def getRequiredAdapters(iface, withViews=False):
     """Get adapter registrations where the specified interface is required."""
-    gsm = getGlobalSiteManager()
-    for reg in _adapterishRegistrations(gsm):
+    from zope.publisher.interfaces import IRequest
+    snapshot = getSnapshot()
+    ancestors = interfaceHierarchy.getAncestors(iface)
+    request = interfaceHierarchy.getBit(IRequest)
+    for reg in _adapterishRegistrations(snapshot):
         # Ignore adapters that have no required interfaces
         if len(reg.required) == 0:
             continue
         # Ignore views
-        if not withViews and reg.required[-1].isOrExtends(IRequest):
+        if not withViews and \
+                interfaceHierarchy.getAncestors(reg.required[-1]) & request:
             continue
         # Only get the adapters for which this interface is required
         for required_iface in reg.required:
-            if iface.isOrExtends(required_iface):
+            if ancestors & interfaceHierarchy.getBit(required_iface):
                 yield reg
 
 
 def getProvidedAdapters(iface, withViews=False):
     """Get adapter registrations where this interface is provided."""
-    gsm = getGlobalSiteManager()
-    for reg in _adapterishRegistrations(gsm):
+    from zope.publisher.interfaces import IRequest
+    snapshot = getSnapshot()
+    bit = interfaceHierarchy.getBit(iface)
+    request = interfaceHierarchy.getBit(IRequest)
+    for reg in _adapterishRegistrations(snapshot):
         # Only get adapters
         # Ignore adapters that have no required interfaces
         if len(reg.required) == 0:
             continue
         # Ignore views
-        if not withViews and reg.required[-1] and \
-                reg.required[-1].isOrExtends(IRequest):
+        if not withViews and \
+                interfaceHierarchy.getAncestors(reg.required[-1]) & request:
             continue
         # Only get adapters for which this interface is provided
-        if reg.provided is None or not reg.provided.isOrExtends(iface):
+        if not interfaceHierarchy.getAncestors(reg.provided) & bit:
             continue
         yield reg
 
@@ -93,7 +121,7 @@ def filterAdapterRegistrations(regs, iface, level=SPECIFIC_INTERFACE_LEVEL):
         if level & EXTENDED_INTERFACE_LEVEL:
             for required_iface in reg.required:
                 if required_iface is not Interface and \
-                        iface.extends(required_iface):
+                        interfaceHierarchy.extends(iface, required_iface):
                     yield reg
                     continue
 
@@ -106,35 +134,158 @@ def filterAdapterRegistrations(regs, iface, level=SPECIFIC_INTERFACE_LEVEL):
 
 def getClasses(iface):
     """Get the classes that implement this interface."""
-    return classRegistry.getClassesThatImplement(iface)
+    return getSnapshot().getClassesThatImplement(iface)
 
 
 def getFactories(iface):
     """Return the factory registrations, who will return objects providing this
     interface."""
-    gsm = getGlobalSiteManager()
-    for reg in gsm.registeredUtilities():
+    bit = interfaceHierarchy.getBit(iface)
+    for reg in getSnapshot().utilities:
         if reg.provided is not IFactory:
             continue
         interfaces = reg.component.getInterfaces()
         try:
-            if interfaces.isOrExtends(iface):
-                yield reg
+            ancestors = interfaceHierarchy.getAncestors(interfaces)
         except AttributeError:
+            ancestors = 0
             for interface in interfaces:
-                if interface.isOrExtends(iface):
-                    yield reg
-                    break
+                ancestors |= interfaceHierarchy.getAncestors(interface)
+        if ancestors & bit:
+            yield reg
 
 
 def getUtilities(iface):
     """Return all utility registrations that provide the interface."""
-    gsm = getGlobalSiteManager()
-    for reg in gsm.registeredUtilities():
-        if reg.provided.isOrExtends(iface):
+    bit = interfaceHierarchy.getBit(iface)
+    for reg in getSnapshot().utilities:
+        if interfaceHierarchy.getAncestors(reg.provided) & bit:
             yield reg
 
 
+def _getIds(bits):
+    """Yield the hierarchy ids of the bits set in a bitset."""
+    while bits:
+        bit = bits & -bits
+        yield bit.bit_length() - 1
+        bits ^= bit
+
+
+def _count(counts, ids):
+    for id in ids:
+        counts[id] = counts.get(id, 0) + 1
+
+
+def _getFactoryAncestors(factory):
+    interfaces = factory.getInterfaces()
+    try:
+        return interfaceHierarchy.getAncestors(interfaces)
+    except AttributeError:
+        ancestors = 0
+        for interface in interfaces:
+            ancestors |= interfaceHierarchy.getAncestors(interface)
+        return ancestors
+
+
+def countRelatedRegistrations(interfaces=None):
+    """Count the registrations related to interfaces in a single pass.
+
+    Returns a list of (interface, counts) tuples in the order of the given
+    interfaces, where the counts are a dictionary with the keys
+    ``required_adapters``, ``provided_adapters``, ``views``, ``utilities``,
+    ``factories`` and ``classes``. The counts are the amounts of results of
+    `getRequiredAdapters()`, `getProvidedAdapters()`,
+    `presentation.getViews()`, `getUtilities()`, `getFactories()` and
+    `getClasses()`. If no interfaces are given, all interfaces registered as
+    utilities are counted.
+    """
+    from zope.interface.interfaces import IInterface
+    from zope.publisher.interfaces import IRequest
+    snapshot = getSnapshot()
+    request = interfaceHierarchy.getBit(IRequest)
+    getId = interfaceHierarchy.getId
+    getAncestors = interfaceHierarchy.getAncestors
+
+    # All counts are keyed by the ids of the interface hierarchy, since
+    # different interfaces can compare equal.
+    # id -> occurrences among the required specifications; the count of an
+    # interface is the sum over its ancestors
+    required = {}
+    viewRequired = {}
+    # Views requiring `None` are registered for all interfaces
+    anyViews = 0
+    # id -> registrations providing the specification or an extension of it
+    provided = {}
+    utilities = {}
+    factories = {}
+    classes = {}
+
+    for reg in snapshot.adapters:
+        if len(reg.required) > 0 and getAncestors(reg.required[-1]) & request:
+            for spec in reg.required[:-1]:
+                if spec is None:
+                    anyViews += 1
+                else:
+                    _count(viewRequired, (getId(spec),))
+    for reg in _adapterishRegistrations(snapshot):
+        if len(reg.required) == 0 or getAncestors(reg.required[-1]) & request:
+            continue
+        _count(required, [getId(spec) for spec in reg.required
+                          if spec is not None])
+        _count(provided, _getIds(getAncestors(reg.provided)))
+    for reg in snapshot.utilities:
+        _count(utilities, _getIds(getAncestors(reg.provided)))
+        if reg.provided is IFactory:
+            _count(factories,
+                   _getIds(_getFactoryAncestors(reg.component)))
+    for path, klass in snapshot.classes:
+        spec = zope.interface.declarations.implementedBy(klass)
+        _count(classes, _getIds(getAncestors(spec)))
+
+    if interfaces is None:
+        bit = interfaceHierarchy.getBit(IInterface)
+        interfaces = []
+        seen = set()
+        for reg in snapshot.utilities:
+            if getAncestors(reg.provided) & bit and \
+                    id(reg.component) not in seen:
+                seen.add(id(reg.component))
+                interfaces.append(reg.component)
+
+    result = []
+    for iface in interfaces:
+        ifaceId = getId(iface)
+        ancestors = list(_getIds(getAncestors(iface)))
+        result.append((iface, {
+            'required_adapters': sum(required.get(ancestor, 0)
+                                     for ancestor in ancestors),
+            'provided_adapters': provided.get(ifaceId, 0),
+            'views': anyViews + sum(viewRequired.get(ancestor, 0)
+                                    for ancestor in ancestors),
+            'utilities': utilities.get(ifaceId, 0),
+            'factories': factories.get(ifaceId, 0),
+            'classes': classes.get(ifaceId, 0)}))
+    return result
+
+
+def getUtilityRegistration(iface_id, url_name):
+    """Return the utility registration for an interface id and URL name.
+
+    These are the ``iface_id`` and ``url_name`` values of the utility's info
+    dictionary. ``None`` is returned, if there is no such utility. The
+    utilities are indexed once per registry generation.
+    """
+    global _utilityIndex
+    snapshot = getSnapshot()
+    indexed, index = _utilityIndex
+    if indexed is not snapshot:
+        index = {}
+        for reg in snapshot.utilities:
+            index[_getInterfaceId(reg.provided), _getUtilityURLName(reg)] = reg
+        _utilityIndex = (snapshot, index)
+    return index.get((iface_id, url_name))
+
+
 def getRealFactory(factory):
     """Get the real factory.
 
@@ -162,6 +313,21 @@ def getParserInfoInfoDictionary(info):
             'ecolumn': info.ecolumn}
 
 
+def getParserInfoSnippet(info):
+    """Return the source text of the directive described by a parser info.
+
+    ``None`` is returned, if the registration was not made by a directive or
+    the file cannot be read.
+    """
+    if info is None or isinstance(info, str):
+        return None
+    try:
+        return getFileSnippet(info.file, info.line, info.column,
+                              info.eline, info.ecolumn)
+    except (OSError, AttributeError):
+        return None
+
+
 def getInterfaceInfoDictionary(iface):
     """Return a PT-friendly info dictionary for an interface."""
     if isinstance(iface, zope.interface.declarations.Implements):
@@ -255,7 +421,7 @@ def getUtilityInfoDictionary(reg):
     path = getPythonPath(component)
 
     # provided interface id
-    iface_id = '{}.{}'.format(reg.provided.__module__, reg.provided.getName())
+    iface_id = _getInterfaceId(reg.provided)
 
     # Determine the URL
     if isinstance(component, InterfaceClass):
@@ -266,7 +432,7 @@ def getUtilityInfoDictionary(reg):
             url = 'Code/%s' % path.replace('.', '/')
 
     return {'name': str(reg.name) or _('<i>no name</i>'),
-            'url_name': encodeUtilityName(reg.name or '__noname__'),
+            'url_name': _getUtilityURLName(reg),
             'iface_id': iface_id,
             'path': path,
             'url': url}
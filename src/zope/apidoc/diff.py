@@ -0,0 +1,217 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Registry Snapshots and Differences
+
+A snapshot file contains one line for every adapter, view and utility
+registration, consisting of a key identifying the registration and a hash of
+its info dictionary. The lines are sorted by key, so that two snapshots can be
+compared in a single pass.
+"""
+import hashlib
+import heapq
+import json
+import sys
+import tempfile
+
+import zope.interface.declarations
+from zope.component import getGlobalSiteManager
+
+from zope.apidoc.component import getAdapterInfoDictionary
+from zope.apidoc.component import getUtilityInfoDictionary
+from zope.apidoc.hierarchy import interfaceHierarchy
+from zope.apidoc.presentation import getViewInfoDictionary
+from zope.apidoc.utilities import getPythonPath
+
+
+SNAPSHOT_HEADER = '# zope.apidoc registry snapshot 1\n'
+
+# Positions in ZCML files change whenever a file is edited
+IGNORED_KEYS = frozenset(['line', 'column', 'eline', 'ecolumn'])
+
+_marker = object()
+
+
+def _getSpecificationPath(spec):
+    if isinstance(spec, zope.interface.declarations.Implements):
+        spec = spec.inherit
+    return getPythonPath(spec)
+
+
+def getRegistrationEntries(registry=None):
+    """Yield (key, info) tuples for all adapters, views and utilities.
+
+    The key is a list of strings identifying the registration; its first
+    item is the kind of the registration.
+    """
+    from zope.publisher.interfaces import IRequest
+
+    if registry is None:
+        registry = getGlobalSiteManager()
+    bit = interfaceHierarchy.getBit(IRequest)
+    for reg in registry.registeredAdapters():
+        required = [_getSpecificationPath(spec) for spec in reg.required]
+        provided = _getSpecificationPath(reg.provided)
+        if (len(reg.required) > 0 and
+                interfaceHierarchy.getAncestors(reg.required[-1]) & bit):
+            yield (['view', required, provided, reg.name],
+                   getViewInfoDictionary(reg))
+        else:
+            yield (['adapter', required, provided, reg.name],
+                   getAdapterInfoDictionary(reg))
+    for reg in registry.registeredUtilities():
+        yield (['utility', _getSpecificationPath(reg.provided), reg.name],
+               getUtilityInfoDictionary(reg))
+
+
+def _normalize(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        # Also converts messages to simple strings
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [item for item in map(_normalize, value)
+                if item is not _marker]
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in IGNORED_KEYS:
+                continue
+            item = _normalize(item)
+            if item is not _marker:
+                result[str(key)] = item
+        return result
+    # Objects, like templates, cannot be compared between builds
+    return _marker
+
+
+def normalizeInfo(info):
+    """Return the info dictionary reduced to comparable data.
+
+    Values that are not simple data are removed, as are the positions of
+    ZCML directives.
+    """
+    return _normalize(info)
+
+
+def hashInfo(info):
+    """Return a hash of the normalized info dictionary."""
+    data = json.dumps(normalizeInfo(info), sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _writeChunk(lines):
+    chunk = tempfile.TemporaryFile('w+', encoding='utf-8')
+    chunk.writelines(lines)
+    chunk.seek(0)
+    return chunk
+
+
+def _sortLines(lines, chunkSize):
+    """Sort lines, keeping at most `chunkSize` lines in memory.
+
+    Sorted chunks are written to temporary files and merged.
+    """
+    chunks = []
+    try:
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= chunkSize:
+                chunk.sort()
+                chunks.append(_writeChunk(chunk))
+                chunk = []
+        chunk.sort()
+        if not chunks:
+            yield from chunk
+            return
+        chunks.append(_writeChunk(chunk))
+        del chunk
+        yield from heapq.merge(*chunks)
+    finally:
+        for chunk in chunks:
+            chunk.close()
+
+
+def writeSnapshot(file, entries=None, chunkSize=10000):
+    """Write a snapshot of the registry entries to a text file.
+
+    If no entries are given, the entries of the global site manager are
+    used.
+    """
+    if entries is None:
+        entries = getRegistrationEntries()
+    lines = (json.dumps(key) + '\t' + hashInfo(info) + '\n'
+             for key, info in entries)
+    file.write(SNAPSHOT_HEADER)
+    file.writelines(_sortLines(lines, chunkSize))
+
+
+def readSnapshot(file):
+    """Yield the (key, hash) tuples of a snapshot file.
+
+    The key is returned in its JSON representation.
+    """
+    lines = iter(file)
+    if next(lines, None) != SNAPSHOT_HEADER:
+        raise ValueError('not a registry snapshot')
+    for line in lines:
+        key, hash = line.rstrip('\n').split('\t')
+        yield key, hash
+
+
+def diffSnapshots(old, new):
+    """Compare two snapshot files.
+
+    Yields (status, key) tuples in key order, where the status is one of
+    ``'added'``, ``'removed'`` and ``'changed'``. Only one entry of each
+    snapshot is kept in memory.
+    """
+    old, new = readSnapshot(old), readSnapshot(new)
+    oldEntry, newEntry = next(old, None), next(new, None)
+    while oldEntry is not None or newEntry is not None:
+        if newEntry is None or (
+                oldEntry is not None and oldEntry[0] < newEntry[0]):
+            yield 'removed', json.loads(oldEntry[0])
+            oldEntry = next(old, None)
+        elif oldEntry is None or newEntry[0] < oldEntry[0]:
+            yield 'added', json.loads(newEntry[0])
+            newEntry = next(new, None)
+        else:
+            if oldEntry[1] != newEntry[1]:
+                yield 'changed', json.loads(newEntry[0])
+            oldEntry, newEntry = next(old, None), next(new, None)
+
+
+def main(args=None):
+    """Print the differences between two snapshot files."""
+    if args is None:
+        args = sys.argv[1:]
+    if len(args) != 2:
+        print('usage: python -m zope.apidoc.diff OLD NEW')
+        return 2
+    symbols = {'added': '+', 'removed': '-', 'changed': '~'}
+    counts = dict.fromkeys(symbols, 0)
+    with open(args[0], encoding='utf-8') as old, \
+            open(args[1], encoding='utf-8') as new:
+        for status, key in diffSnapshots(old, new):
+            counts[status] += 1
+            print(symbols[status], ' '.join(map(json.dumps, key)))
+    print('{added} added, {removed} removed, {changed} changed'.format(
+        **counts))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Registry Generations
+"""
+import zope.event
+from zope.component import getGlobalSiteManager
+from zope.interface.interfaces import IRegistrationEvent
+from zope.testing.cleanup import addCleanUp
+
+from zope.apidoc.classregistry import getClassRegistry
+
+
+_generation = 0
+
+# The state of the registries when the generation was last determined
+_lastState = None
+
+
+def cleanUp():
+    global _generation, _lastState
+    _generation = 0
+    _lastState = None
+
+
+addCleanUp(cleanUp)
+
+
+def registrationChanged(event):
+    """Start a new generation for every (un)registration event."""
+    global _generation
+    if IRegistrationEvent.providedBy(event):
+        _generation += 1
+
+
+zope.event.subscribers.append(registrationChanged)
+
+
+def _getState():
+    # Registrations made with ``event=False``, like the ones of
+    # ``zope.component.provideAdapter()``, do not send any events; so we also
+    # keep an eye on the counters of the global registry.
+    gsm = getGlobalSiteManager()
+    classRegistry = getClassRegistry()
+    return (id(classRegistry), classRegistry.generation,
+            getattr(gsm.adapters, '_generation', None),
+            getattr(gsm.utilities, '_generation', None),
+            len(getattr(gsm, '_adapter_registrations', ())),
+            len(getattr(gsm, '_subscription_registrations', ())),
+            len(getattr(gsm, '_handler_registrations', ())),
+            len(getattr(gsm, '_utility_registrations', ())))
+
+
+def currentGeneration():
+    """Return the current generation of the component and class registries.
+
+    The generation is an integer that increases whenever a component is
+    registered or unregistered, or the class registry changes. It is meant
+    to be used as part of the keys of cached results.
+    """
+    global _generation, _lastState
+    state = _getState()
+    if state != _lastState:
+        if _lastState is not None:
+            _generation += 1
+        _lastState = state
+    return _generation
+
+
+class GenerationalCache(dict):
+    """A dictionary that is emptied whenever the generation changes."""
+
+    generation = None
+
+    def validate(self):
+        """Clear the cache if the generation has changed since the last call.
+
+        Returns the current generation.
+        """
+        generation = currentGeneration()
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+        return generation
@@ -0,0 +1,230 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Interface Hierarchy
+"""
+import threading
+import weakref
+
+from zope.interface.interface import InterfaceClass
+from zope.testing.cleanup import addCleanUp
+
+
+def _isPermanent(spec):
+    """Return whether the specification lives as long as its definition.
+
+    Interfaces and the declarations of classes are kept for good, while other
+    declarations, like those returned by the ``getInterfaces()`` method of
+    factories, are often created anew for every call.
+    """
+    return (isinstance(spec, InterfaceClass) or
+            getattr(spec, 'inherit', None) is not None)
+
+
+class _Entry:
+    """The id and the ancestors of one specification."""
+
+    __slots__ = ('ref', 'id', 'ancestors', 'subscribed')
+
+    def __init__(self, ref, id):
+        self.ref = ref
+        self.id = id
+        # bitset of the ids of all ancestors, None if not computed
+        self.ancestors = None
+        self.subscribed = False
+
+
+class InterfaceHierarchy:
+    """Precomputed ancestry of interfaces and other specifications.
+
+    Every specification gets a dense integer id. The ancestors of a
+    specification, including itself, are stored as a bitset in a Python
+    integer, so that checking whether one specification extends another is
+    a single bit test.
+
+    Specifications are looked up by identity, since interfaces compare
+    equal by their module and name only, and they are only referenced
+    weakly. The id of a specification that was garbage collected is given
+    to the next new one. The ancestors of transient declarations are never
+    stored.
+
+    The hierarchy is shared by all threads. Looking up ids and ancestors
+    that are already known does not lock; new entries are added while
+    holding a lock.
+    """
+
+    def __init__(self):
+        def remove(ref, selfref=weakref.ref(self)):
+            self = selfref()
+            if self is not None:
+                # Only note the removal; the callback may run while the
+                # hierarchy is being changed.
+                self._pendingRemovals.append(ref)
+        self._remove = remove
+        self._pendingRemovals = []
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # id() of the specification -> entry
+            self._entries = {}
+            # id -> weak reference to the specification, None if unused
+            self._refs = []
+            # unused ids
+            self._free = []
+            # incremented whenever the stored ancestors are discarded
+            self._changes = 0
+            del self._pendingRemovals[:]
+
+    def _purge(self):
+        # Must be called while holding the lock
+        while self._pendingRemovals:
+            ref = self._pendingRemovals.pop()
+            entry = self._entries.get(ref.key)
+            if entry is not None and entry.ref is ref:
+                del self._entries[ref.key]
+                self._refs[entry.id] = None
+                self._free.append(entry.id)
+
+    def _getEntry(self, spec):
+        entry = self._entries.get(id(spec))
+        if entry is not None and entry.ref() is spec:
+            return entry
+        return None
+
+    def _addEntry(self, spec):
+        with self._lock:
+            # Another thread might have been faster
+            entry = self._getEntry(spec)
+            if entry is not None:
+                return entry
+            self._purge()
+            ref = weakref.KeyedRef(spec, self._remove, id(spec))
+            if self._free:
+                entry = _Entry(ref, self._free.pop())
+                self._refs[entry.id] = ref
+            else:
+                entry = _Entry(ref, len(self._refs))
+                self._refs.append(ref)
+            self._entries[id(spec)] = entry
+            return entry
+
+    def getId(self, spec):
+        """Return the integer id of the specification."""
+        entry = self._getEntry(spec)
+        if entry is None:
+            entry = self._addEntry(spec)
+        return entry.id
+
+    def getSpecification(self, id):
+        """Return the specification with the given id."""
+        ref = self._refs[id]
+        return None if ref is None else ref()
+
+    def getBit(self, spec):
+        """Return the bit representing the specification.
+
+        ``None`` is represented by no bit at all.
+        """
+        if spec is None:
+            return 0
+        return 1 << self.getId(spec)
+
+    def _computeAncestors(self, sro):
+        bits = 0
+        for ancestor in sro:
+            if _isPermanent(ancestor):
+                bits |= 1 << self.getId(ancestor)
+            else:
+                # Transient declarations only have a bit, if it was asked for
+                entry = self._getEntry(ancestor)
+                if entry is not None:
+                    bits |= 1 << entry.id
+        return bits
+
+    def getAncestors(self, spec):
+        """Return the bitset of the specification and all its ancestors."""
+        if spec is None:
+            return 0
+        # Access the resolution order first, so that non-specifications fail
+        # with an attribute error.
+        sro = spec.__sro__
+        if not _isPermanent(spec):
+            return self._computeAncestors(sro)
+        entry = self._getEntry(spec)
+        if entry is not None:
+            bits = entry.ancestors
+            if bits is not None:
+                return bits
+        changes = self._changes
+        bits = self._computeAncestors(sro)
+        # The specification itself got an entry as part of its own ancestors,
+        # unless the hierarchy was cleared meanwhile
+        entry = self._getEntry(spec)
+        if entry is None:
+            return bits
+        with self._lock:
+            if not entry.subscribed:
+                # Get notified when the bases of the specification change.
+                spec.subscribe(self)
+                entry.subscribed = True
+            # Do not store ancestors computed from outdated bases
+            if changes == self._changes:
+                entry.ancestors = bits
+        return bits
+
+    def getSpecifications(self, bits):
+        """Return the specifications whose bits are set in the bitset."""
+        specs = []
+        id = 0
+        while bits:
+            if bits & 1:
+                spec = self.getSpecification(id)
+                if spec is not None:
+                    specs.append(spec)
+            bits >>= 1
+            id += 1
+        return specs
+
+    def changed(self, originally_changed):
+        # Changing the bases of one specification can change the ancestors
+        # of many others, so simply start over.
+        with self._lock:
+            self._changes += 1
+            for entry in self._entries.values():
+                entry.ancestors = None
+
+    def isOrExtends(self, spec, other):
+        """Return whether `spec` is or extends `other`."""
+        bit = self.getBit(other)
+        return bool(self.getAncestors(spec) & bit)
+
+    def extends(self, spec, other):
+        """Return whether `spec` extends `other`, but is not `other`."""
+        return spec is not other and self.isOrExtends(spec, other)
+
+    def filterExtending(self, specs, other):
+        """Return the specifications that are or extend `other`."""
+        bit = self.getBit(other)
+        return [spec for spec in specs if self.getAncestors(spec) & bit]
+
+
+interfaceHierarchy = InterfaceHierarchy()
+
+
+def cleanUp():
+    interfaceHierarchy.clear()
+
+
+addCleanUp(cleanUp)
@@ -13,7 +13,7 @@
 ##############################################################################
 """Interface Inspection Utilities
 """
-import inspect
+import weakref
 
 from zope.interface import Interface
 from zope.interface import providedBy
@@ -23,34 +23,118 @@ from zope.interface.interfaces import IInterface
 from zope.interface.interfaces import IMethod
 from zope.interface.interfaces import ISpecification
 from zope.schema.interfaces import IField
+from zope.testing.cleanup import addCleanUp
 
-from zope.apidoc.utilities import getDocFormat
+from zope.apidoc.utilities import getFunctionSignatures
 from zope.apidoc.utilities import getPythonPath
 from zope.apidoc.utilities import renderText
+from zope.apidoc.utilities import resolveDocFormat
+
+
+# Signature strings of interface methods
+_signatureCache = weakref.WeakKeyDictionary()
+
+# Attributes of specifications storing values computed from them.
+# Specifications compare equal by module and name, so a dictionary keyed by
+# specifications would confuse different ones of the same name; it would also
+# keep them, and the classes of their declarations, alive.
+_ELEMENT_TABLE = '_v_apidoc_elementTable'
+_INTERFACE_TYPES = '_v_apidoc_interfaceTypes'
+_FIELD_INTERFACES = '_v_apidoc_fieldInterfaces'
+
+
+def cleanUp():
+    _signatureCache.clear()
+
+
+addCleanUp(cleanUp)
+
+
+class _Invalidator:
+    """Remove a cached value from a specification once it changes."""
+
+    def __init__(self, spec, attribute):
+        self.spec = spec
+        self.attribute = attribute
+
+    def changed(self, originally_changed):
+        self.spec.__dict__.pop(self.attribute, None)
+
+
+def _getCached(spec, attribute, compute):
+    """Return the value cached on the specification, computing it if
+    necessary.
+
+    The value is discarded when `spec` sends a `changed()` notification.
+    """
+    try:
+        return spec.__dict__[attribute][0]
+    except KeyError:
+        pass
+    value = compute()
+    # Specifications only reference their subscribers weakly, so the
+    # invalidator is stored along with the value
+    invalidator = _Invalidator(spec, attribute)
+    spec.subscribe(invalidator)
+    setattr(spec, attribute, (value, invalidator))
+    return value
+
+
+def _fieldOrder(item):
+    return item[1].order
+
+
+class _ElementTable:
+    """The elements of an interface, classified by their type."""
+
+    def __init__(self, iface):
+        self.elements = {}
+        self.byType = {IElement: self.elements,
+                       IAttribute: {},
+                       IMethod: {},
+                       IField: {}}
+        for name in iface:
+            attr = iface[name]
+            if not IElement.providedBy(attr):
+                continue
+            self.elements[name] = attr
+            for type, items in self.byType.items():
+                if type is not IElement and type.providedBy(attr):
+                    items[name] = attr
+
+        fields = self.byType[IField]
+        methods = self.byType[IMethod]
+        self.attributes = [(name, attr)
+                           for name, attr in self.byType[IAttribute].items()
+                           if name not in fields and name not in methods]
+        self.fieldsInOrder = sorted(fields.items(), key=_fieldOrder)
+
+
+def _getElementTable(iface):
+    return _getCached(iface, _ELEMENT_TABLE, lambda: _ElementTable(iface))
 
 
 def getElements(iface, type=IElement):
     """Return a dictionary containing the elements in an interface.
 
     The type specifies whether we are looking for attributes or methods."""
-    items = {}
-    for name in iface:
-        attr = iface[name]
-        if type.providedBy(attr):
-            items[name] = attr
-    return items
+    table = _getElementTable(iface)
+    if type in table.byType:
+        return dict(table.byType[type])
+    return {name: attr for name, attr in table.elements.items()
+            if type.providedBy(attr)}
 
 
-def getFieldsInOrder(iface, _itemkey=lambda x: x[1].order):
+def getFieldsInOrder(iface, _itemkey=_fieldOrder):
     """Return a list of (name, field) tuples in native interface order."""
+    if _itemkey is _fieldOrder:
+        return list(_getElementTable(iface).fieldsInOrder)
     return sorted(getElements(iface, IField).items(), key=_itemkey)
 
 
 def getAttributes(iface):
     """Returns a list of attributes specified in the interface."""
-    return [(name, attr)
-            for name, attr in getElements(iface, IAttribute).items()
-            if not (IField.providedBy(attr) or IMethod.providedBy(attr))]
+    return list(_getElementTable(iface).attributes)
 
 
 def getMethods(iface):
@@ -63,13 +147,26 @@ def getFields(iface):
     return getFieldsInOrder(iface)
 
 
-def getInterfaceTypes(iface):
-    """Return a list of interface types that are specified for this
-    interface.
+def getMethodSignature(method):
+    """Return the signature string of an interface method."""
+    try:
+        return _signatureCache[method]
+    except KeyError:
+        signature = _signatureCache[method] = method.getSignatureString()
+        return signature
 
-    Note that you should only expect one type at a time.
-    """
-    types = list(providedBy(iface).flattened())
+
+def getMethodSignatures(obj):
+    """Return a dictionary of the signatures of all methods of an interface
+    or class."""
+    if IInterface.providedBy(obj):
+        return {name: getMethodSignature(method)
+                for name, method in getMethods(obj)}
+    return getFunctionSignatures(obj)
+
+
+def _computeInterfaceTypes(spec):
+    types = list(spec.flattened())
     # Remove interfaces provided by every interface instance
     types.remove(ISpecification)
     types.remove(IElement)
@@ -79,11 +176,20 @@ def getInterfaceTypes(iface):
     return types
 
 
-def getFieldInterface(field):
-    """Return the interface representing the field."""
-    name = field.__class__.__name__
+def getInterfaceTypes(iface):
+    """Return a list of interface types that are specified for this
+    interface.
+
+    Note that you should only expect one type at a time.
+    """
+    spec = providedBy(iface)
+    return list(_getCached(spec, _INTERFACE_TYPES,
+                           lambda: _computeInterfaceTypes(spec)))
+
+
+def _computeFieldInterface(spec, name):
     field_iface = None
-    ifaces = tuple(providedBy(field).flattened())
+    ifaces = tuple(spec.flattened())
     for iface in ifaces:
         # All field interfaces implement `IField`. In case the name match
         # below does not work, use the first `IField`-based interface found
@@ -99,24 +205,40 @@ def getFieldInterface(field):
     return field_iface or ifaces[0]
 
 
+def getFieldInterface(field):
+    """Return the interface representing the field."""
+    name = field.__class__.__name__
+    spec = providedBy(field)
+    interfaces = _getCached(spec, _FIELD_INTERFACES, dict)
+    try:
+        return interfaces[name]
+    except KeyError:
+        iface = interfaces[name] = _computeFieldInterface(spec, name)
+        return iface
+
+
+def _getModule(attr):
+    return getattr(attr.interface, '__module__', None)
+
+
 def _getDocFormat(attr):
-    module = inspect.getmodule(attr.interface)
-    return getDocFormat(module)
+    return resolveDocFormat(_getModule(attr))
 
 
 def getAttributeInfoDictionary(attr, format=None):
     """Return a page-template-friendly information dictionary."""
     format = format or _getDocFormat(attr)
     return {'name': attr.getName(),
-            'doc': renderText(attr.getDoc() or '', format=format)}
+            'doc': renderText(attr.getDoc() or '', _getModule(attr), format)}
 
 
 def getMethodInfoDictionary(method, format=None):
     """Return a page-template-friendly information dictionary."""
     format = format or _getDocFormat(method)
     return {'name': method.getName(),
-            'signature': method.getSignatureString(),
-            'doc': renderText(method.getDoc() or '', format=format)}
+            'signature': getMethodSignature(method),
+            'doc': renderText(method.getDoc() or '', _getModule(method),
+                              format)}
 
 
 def getFieldInfoDictionary(field, format=None):
@@ -139,6 +261,7 @@ def getFieldInfoDictionary(field, format=None):
                      'path': getPythonPath(class_).replace('.', '/')}
 
     # Render the field description
-    info['description'] = renderText(field.description or '', format=format)
+    info['description'] = renderText(field.description or '',
+                                     _getModule(field), format)
 
     return info
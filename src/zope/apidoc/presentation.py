@@ -13,18 +13,16 @@
 ##############################################################################
 """Views/Presentation Utilities
 """
-from zope.browserresource.icon import IconViewFactory
-from zope.component import getGlobalSiteManager
+import weakref
+
 from zope.i18nmessageid import ZopeMessageFactory as _
 from zope.interface import Interface
-from zope.publisher.interfaces import IRequest
-from zope.publisher.interfaces.browser import IBrowserRequest
-from zope.publisher.interfaces.ftp import IFTPRequest
-from zope.publisher.interfaces.http import IHTTPRequest
-from zope.publisher.interfaces.xmlrpc import IXMLRPCRequest
+from zope.testing.cleanup import addCleanUp
 
 from zope.apidoc.component import getInterfaceInfoDictionary
 from zope.apidoc.component import getParserInfoInfoDictionary
+from zope.apidoc.hierarchy import interfaceHierarchy
+from zope.apidoc.snapshot import getSnapshot
 from zope.apidoc.utilities import getPermissionIds
 from zope.apidoc.utilities import getPythonPath
 from zope.apidoc.utilities import relativizePath
@@ -39,17 +37,43 @@ XMLRPC_DIRECTIVES_MODULE = 'zope.app.publisher.xmlrpc.metaconfigure'
 JSONRPC_DIRECTIVES_MODULE = 'jsonserver.metaconfigure'
 
 
-def getViewFactoryData(factory):
-    """Squeeze some useful information out of the view factory"""
-    info = {'path': None, 'url': None, 'template': None, 'resource': None,
-            'referencable': True}
+# Cache of the analysis results of the most basic view factories
+_viewFactoryDataCache = weakref.WeakKeyDictionary()
 
-    # Always determine the most basic factory
+
+def cleanUp():
+    _viewFactoryDataCache.clear()
+
+
+addCleanUp(cleanUp)
+
+
+def _getBasicFactory(factory):
     # Commonly, factories are wrapped to provide security or location, for
     # example. If those wrappers play nice, then they provide a `factory`
     # attribute, that points to the original factory.
     while hasattr(factory, 'factory'):
         factory = factory.factory
+    return factory
+
+
+def getViewFactoryData(factory):
+    """Squeeze some useful information out of the view factory"""
+    # Always determine the most basic factory
+    factory = _getBasicFactory(factory)
+    try:
+        info = _viewFactoryDataCache.get(factory)
+    except TypeError:
+        # The factory cannot be weakly referenced or is not hashable
+        return _analyzeViewFactory(factory)
+    if info is None:
+        info = _viewFactoryDataCache[factory] = _analyzeViewFactory(factory)
+    return dict(info)
+
+
+def _analyzeViewFactory(factory):
+    info = {'path': None, 'url': None, 'template': None, 'resource': None,
+            'referencable': True}
 
     if hasattr(factory, '__name__') and \
        factory.__name__.startswith('SimpleViewClass'):
@@ -100,6 +124,8 @@ def getViewFactoryData(factory):
     if info['referencable']:
         info['url'] = info['path'].replace('.', '/')
 
+    # Only import the icon machinery when it is needed
+    from zope.browserresource.icon import IconViewFactory
     if isinstance(factory, IconViewFactory):
         info['resource'] = factory.rname
 
@@ -108,28 +134,67 @@ def getViewFactoryData(factory):
 
 def getPresentationType(iface):
     """Get the presentation type from a layer interface."""
+    from zope.publisher.interfaces.browser import IBrowserRequest
+    from zope.publisher.interfaces.ftp import IFTPRequest
+    from zope.publisher.interfaces.http import IHTTPRequest
+    from zope.publisher.interfaces.xmlrpc import IXMLRPCRequest
+
     # Note that the order of the requests matters here, since we want to
     # inspect the most specific one first. For example, IBrowserRequest is also
     # an IHTTPRequest.
+    ancestors = interfaceHierarchy.getAncestors(iface)
     for type in [IBrowserRequest, IXMLRPCRequest, IHTTPRequest, IFTPRequest]:
-        if iface.isOrExtends(type):
+        if ancestors & interfaceHierarchy.getBit(type):
             return type
     return iface
 
 
-def getViews(iface, type=IRequest):
-    """Get all view registrations for a particular interface."""
-    gsm = getGlobalSiteManager()
-    for reg in gsm.registeredAdapters():
+def getViews(iface, type=None):
+    """Get all view registrations for a particular interface.
+
+    If no type is given, views of all presentation types are returned.
+    """
+    if type is None:
+        from zope.publisher.interfaces import IRequest
+        type = IRequest
+    ancestors = interfaceHierarchy.getAncestors(iface)
+    bit = interfaceHierarchy.getBit(type)
+    for reg in getSnapshot().adapters:
         if (len(reg.required) > 0 and
-                reg.required[-1] is not None and
-                reg.required[-1].isOrExtends(type)):
+                interfaceHierarchy.getAncestors(reg.required[-1]) & bit):
 
             for required_iface in reg.required[:-1]:
-                if required_iface is None or iface.isOrExtends(required_iface):
+                if required_iface is None or \
+                        ancestors & interfaceHierarchy.getBit(required_iface):
                     yield reg
 
 
+def getAllViewFactoryData(type=None):
+    """Get all view registrations together with their factory data.
+
+    Yields (registration, info) tuples for all views of the presentation
+    type; if no type is given, views of all presentation types are returned.
+    Every distinct factory is only analyzed once.
+    """
+    if type is None:
+        from zope.publisher.interfaces import IRequest
+        type = IRequest
+    bit = interfaceHierarchy.getBit(type)
+    # id of factory -> (factory, info); the factory is kept to keep the id
+    # valid
+    analyzed = {}
+    for reg in getSnapshot().adapters:
+        if (len(reg.required) > 0 and
+                interfaceHierarchy.getAncestors(reg.required[-1]) & bit):
+            factory = _getBasicFactory(reg.factory)
+            try:
+                info = analyzed[id(factory)][1]
+            except KeyError:
+                info = getViewFactoryData(factory)
+                analyzed[id(factory)] = factory, info
+            yield reg, dict(info)
+
+
 def filterViewRegistrations(regs, iface, level=SPECIFIC_INTERFACE_LEVEL):
     """Return only those registrations that match the specifed level"""
     for reg in regs:
@@ -142,7 +207,7 @@ def filterViewRegistrations(regs, iface, level=SPECIFIC_INTERFACE_LEVEL):
         if level & EXTENDED_INTERFACE_LEVEL:
             for required_iface in reg.required[:-1]:
                 if required_iface is not Interface and \
-                        iface.extends(required_iface):
+                        interfaceHierarchy.extends(iface, required_iface):
                     yield reg
                     continue
 
@@ -0,0 +1,264 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Indexed Queries over Component Registrations
+"""
+from zope.testing.cleanup import addCleanUp
+
+from zope.apidoc.component import getRealFactory
+from zope.apidoc.hierarchy import interfaceHierarchy
+from zope.apidoc.snapshot import getSnapshot
+
+
+KINDS = ('adapter', 'view', 'subscriber', 'handler', 'utility')
+
+# Positions of the attributes in the records of the index
+_REGISTRATION, _KIND, _NAME, _REQUIRED, _PROVIDED, _MODULE, _FILE = range(7)
+
+
+def _getRegistrations(snapshot):
+    """Yield (kind, registration) tuples for all registrations."""
+    from zope.publisher.interfaces import IRequest
+    request = interfaceHierarchy.getBit(IRequest)
+    for reg in snapshot.adapters:
+        if (len(reg.required) > 0 and
+                interfaceHierarchy.getAncestors(reg.required[-1]) & request):
+            yield 'view', reg
+        else:
+            yield 'adapter', reg
+    for reg in snapshot.subscriptionAdapters:
+        yield 'subscriber', reg
+    for reg in snapshot.handlers:
+        yield 'handler', reg
+    for reg in snapshot.utilities:
+        yield 'utility', reg
+
+
+def _addPosition(index, key, position):
+    positions = index.get(key)
+    if positions is None:
+        positions = index[key] = []
+    positions.append(position)
+
+
+def _isInModule(module, name):
+    return module == name or module.startswith(name + '.')
+
+
+class _SnapshotIndexes:
+    """The indexes over the registrations of one registry snapshot.
+
+    The indexes are completely built before they are used and never changed
+    afterwards.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.generation = snapshot.generation
+        # position -> (registration, kind, name, bitset of the required
+        #              specifications, bitset of the ancestors of the
+        #              provided interface, module of the factory, ZCML file)
+        self.records = []
+        # attribute value -> positions; the required and provided
+        # specifications are keyed by their id in the interface hierarchy,
+        # since different interfaces can compare equal
+        self.kinds = {}
+        self.names = {}
+        self.required = {}
+        self.provided = {}
+        self.modules = {}
+        self.files = {}
+        for kind, reg in _getRegistrations(snapshot):
+            self._index(kind, reg)
+
+    def _index(self, kind, reg):
+        position = len(self.records)
+        required = 0
+        for spec in getattr(reg, 'required', ()):
+            if spec is None:
+                continue
+            id = interfaceHierarchy.getId(spec)
+            # The same specification may be required several times
+            if not required & 1 << id:
+                required |= 1 << id
+                _addPosition(self.required, id, position)
+        provided = interfaceHierarchy.getAncestors(reg.provided)
+        if reg.provided is not None:
+            _addPosition(self.provided, interfaceHierarchy.getId(reg.provided),
+                         position)
+        factory = reg.component if kind == 'utility' else reg.factory
+        module = getattr(getRealFactory(factory), '__module__', None)
+        if module is not None:
+            _addPosition(self.modules, module, position)
+        file = None
+        if not isinstance(reg.info, str):
+            file = getattr(reg.info, 'file', None)
+        if file is not None:
+            _addPosition(self.files, file, position)
+        _addPosition(self.kinds, kind, position)
+        _addPosition(self.names, reg.name, position)
+        self.records.append(
+            (reg, kind, reg.name, required, provided, module, file))
+
+    def _getUnion(self, index, keys):
+        if len(keys) == 1:
+            return index[keys[0]]
+        positions = set()
+        for key in keys:
+            positions.update(index[key])
+        return sorted(positions)
+
+    def plan(self, required=None, provided=None, name=None, kind=None,
+             factoryModule=None, zcmlFile=None):
+        """Return the steps of the query, most selective first.
+
+        Every step is a tuple of the predicate name, the estimated amount of
+        matching registrations, a function returning the positions of the
+        matching registrations and a function testing a single record.
+        """
+        steps = []
+
+        def addStep(predicate, index, keys, matches):
+            keys = list(keys)
+            estimate = sum(len(index[key]) for key in keys)
+            steps.append((predicate, estimate,
+                          lambda: self._getUnion(index, keys), matches))
+
+        if required is not None:
+            ancestors = interfaceHierarchy.getAncestors(required)
+            addStep('required', self.required,
+                    [id for id in map(interfaceHierarchy.getId,
+                                      required.__sro__)
+                     if id in self.required],
+                    lambda record: record[_REQUIRED] & ancestors)
+        if provided is not None:
+            bit = interfaceHierarchy.getBit(provided)
+            addStep('provided', self.provided,
+                    [id for id in self.provided
+                     if interfaceHierarchy.getAncestors(
+                         interfaceHierarchy.getSpecification(id)) & bit],
+                    lambda record: record[_PROVIDED] & bit)
+        if name is not None:
+            addStep('name', self.names,
+                    [name] if name in self.names else [],
+                    lambda record: record[_NAME] == name)
+        if kind is not None:
+            if kind not in KINDS:
+                raise ValueError('unknown kind of registration: %r' % kind)
+            addStep('kind', self.kinds,
+                    [kind] if kind in self.kinds else [],
+                    lambda record: record[_KIND] == kind)
+        if factoryModule is not None:
+            addStep('factoryModule', self.modules,
+                    [module for module in self.modules
+                     if _isInModule(module, factoryModule)],
+                    lambda record: record[_MODULE] is not None and
+                    _isInModule(record[_MODULE], factoryModule))
+        if zcmlFile is not None:
+            addStep('zcmlFile', self.files,
+                    [zcmlFile] if zcmlFile in self.files else [],
+                    lambda record: record[_FILE] == zcmlFile)
+        steps.sort(key=lambda step: step[1])
+        return steps
+
+
+class RegistrationIndex:
+    """Indexes over the registrations of the global site manager.
+
+    There is an index for every attribute that can be queried. The indexes
+    are built anew for every registry snapshot and replace the previous ones
+    in a single assignment, so queries running meanwhile keep using the
+    indexes they started with.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._indexes = None
+
+    @property
+    def generation(self):
+        """The registry generation of the current indexes."""
+        indexes = self._indexes
+        return None if indexes is None else indexes.generation
+
+    def update(self):
+        """Return the indexes of the current registry snapshot.
+
+        The indexes are only rebuilt, if the registrations have changed.
+        """
+        snapshot = getSnapshot()
+        indexes = self._indexes
+        if indexes is None or indexes.snapshot is not snapshot:
+            indexes = self._indexes = _SnapshotIndexes(snapshot)
+        return indexes
+
+    def explain(self, **query):
+        """Return the (predicate, estimate) tuples of the query plan."""
+        return [(predicate, estimate)
+                for predicate, estimate, positions, matches
+                in self.update().plan(**query)]
+
+    def query(self, **query):
+        """Return the registrations matching all given predicates.
+
+        The supported predicates are:
+
+        required -- an interface; registrations requiring the interface or
+                    one of its bases match.
+
+        provided -- an interface; registrations providing the interface or
+                    an interface extending it match.
+
+        name -- the name of the registration.
+
+        kind -- one of ``'adapter'``, ``'view'``, ``'subscriber'``,
+                ``'handler'`` and ``'utility'``.
+
+        factoryModule -- a module or package name; registrations whose
+                         factory or component is defined in it match.
+
+        zcmlFile -- the path of the ZCML file containing the registration.
+
+        The registrations are returned in registry order.
+        """
+        indexes = self.update()
+        steps = indexes.plan(**query)
+        if not steps:
+            return [record[_REGISTRATION] for record in indexes.records]
+        # Start with the smallest set of registrations and only test the
+        # remaining predicates on them
+        positions = steps[0][2]()
+        records = [indexes.records[position] for position in positions]
+        for predicate, estimate, getPositions, matches in steps[1:]:
+            records = [record for record in records if matches(record)]
+        return [record[_REGISTRATION] for record in records]
+
+
+registrationIndex = RegistrationIndex()
+
+
+def cleanUp():
+    registrationIndex.clear()
+
+
+addCleanUp(cleanUp)
+
+
+def queryRegistrations(**query):
+    """Return the registrations of the global site manager matching a query.
+
+    See `RegistrationIndex.query()` for the supported predicates.
+    """
+    return registrationIndex.query(**query)
@@ -0,0 +1,123 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Persistent Render Cache
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+RENDERER_DISTRIBUTIONS = ('zope.renderer', 'docutils', 'zope.structuredtext')
+
+
+def _getDistributionVersion(name):
+    try:
+        from importlib.metadata import PackageNotFoundError
+        from importlib.metadata import version
+    except ImportError:  # Python 3.7
+        import pkg_resources
+        try:
+            return pkg_resources.get_distribution(name).version
+        except pkg_resources.DistributionNotFound:
+            return ''
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return ''
+
+
+def getRendererVersion():
+    """Return a string identifying the versions of the rendering packages."""
+    return ' '.join('{}={}'.format(name, _getDistributionVersion(name))
+                    for name in RENDERER_DISTRIBUTIONS)
+
+
+class RenderCache:
+    """A content-addressed cache of rendered texts stored in SQLite.
+
+    The database uses write-ahead logging, so that many processes can read
+    it while one of them writes. Every thread and process uses its own
+    connection.
+
+    Entries are keyed by a hash of the text, the renderer source id and the
+    version of the rendering packages, so that upgrading the renderer
+    invalidates all entries.
+    """
+
+    def __init__(self, path, version=None, timeout=30.0):
+        self.path = path
+        self.version = getRendererVersion() if version is None else version
+        self.timeout = timeout
+        self._local = threading.local()
+        # Create the database right away, so that errors surface early.
+        self._getConnection()
+
+    def _getConnection(self):
+        connection = getattr(self._local, 'connection', None)
+        # Connections must not be shared with forked worker processes.
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rendered '
+                '(key TEXT PRIMARY KEY, html TEXT NOT NULL)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def getKey(self, text, format):
+        """Return the cache key of a text in the given format."""
+        data = '\0'.join((self.version, format, text))
+        return hashlib.sha256(
+            data.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get(self, text, format, default=None):
+        """Return the rendered text or `default`, if it was not cached.
+
+        Database errors, like a database locked for longer than the timeout,
+        are treated like a missing entry.
+        """
+        try:
+            row = self._getConnection().execute(
+                'SELECT html FROM rendered WHERE key = ?',
+                (self.getKey(text, format),)).fetchone()
+        except sqlite3.Error:
+            return default
+        return default if row is None else row[0]
+
+    def set(self, text, format, html):
+        """Store the rendered text.
+
+        The text is not stored, if the database cannot be written.
+        """
+        try:
+            self._getConnection().execute(
+                'INSERT OR REPLACE INTO rendered (key, html) VALUES (?, ?)',
+                (self.getKey(text, format), html))
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        return self._getConnection().execute(
+            'SELECT COUNT(*) FROM rendered').fetchone()[0]
+
+    def close(self):
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local.connection = None
@@ -0,0 +1,242 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Rendering Texts in Worker Processes
+"""
+import collections
+import hashlib
+import html
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from zope.apidoc.generation import currentGeneration
+from zope.apidoc.utilities import _render
+from zope.apidoc.utilities import getRenderCache
+from zope.apidoc.utilities import preprocessText
+
+
+# Seconds a worker may need in addition to its budget, before we stop
+# waiting for it
+GRACE_PERIOD = 1.0
+
+
+class FallbackText(str):
+    """The HTML shown for a text that could not be rendered in time."""
+
+    isFallback = True
+
+
+def renderFallback(text):
+    """Return the text as escaped, preformatted HTML."""
+    return FallbackText('<pre>%s</pre>' % html.escape(text))
+
+
+def getTextHash(text):
+    """Return a hash identifying a text in the `slowDocstrings` report."""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _raiseTimeout(signum, frame):
+    raise _Timeout()
+
+
+def _renderInWorker(text, format, budget):
+    """Render a text, giving up after `budget` seconds.
+
+    Runs in a worker process, so that the budget only starts when a worker
+    picks up the text. Returns a tuple of the HTML, or ``None`` if the text
+    took too long, and the seconds spent on it.
+    """
+    started = time.perf_counter()
+    previous = signal.signal(signal.SIGALRM, _raiseTimeout)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, budget)
+        try:
+            html = _render(text, format)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except _Timeout:
+        html = None
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+    return html, time.perf_counter() - started
+
+
+class _Workers:
+    """The worker processes of one registry generation."""
+
+    def __init__(self, processes, generation):
+        self.pool = multiprocessing.get_context('fork').Pool(processes)
+        self.generation = generation
+        # Amount of texts submitted and not finished yet
+        self.queued = 0
+
+
+class RenderPool:
+    """A pool of worker processes rendering texts with a time budget.
+
+    Texts taking longer than `budget` seconds to render are replaced by a
+    plain text fallback and recorded in `slowDocstrings` as tuples of the
+    module, the hash of the text (see `getTextHash()`) and the seconds spent
+    on it. Only the last `maxSlowDocstrings` texts are kept.
+
+    The workers are forked from the calling process, so that they share its
+    component registrations. When the registrations change, the workers are
+    replaced. Where processes cannot be forked, texts are rendered in the
+    calling process without a budget.
+
+    The pool can be used by many threads. The budget of a text starts when a
+    worker picks it up, so texts waiting for a free worker are not charged
+    for the wait. Forking while another thread holds a lock can leave the
+    workers deadlocked, so threaded servers should `start()` the pool before
+    they start their threads.
+    """
+
+    def __init__(self, processes=None, budget=1.0, maxSlowDocstrings=1000):
+        self.processes = processes or os.cpu_count() or 1
+        self.budget = budget
+        self.slowDocstrings = collections.deque(maxlen=maxSlowDocstrings)
+        self._workers = None
+        # Protects `_workers` and the amounts of queued texts
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker processes, if they are not running yet."""
+        self._getWorkers()
+
+    def _getWorkers(self):
+        retired = None
+        with self._lock:
+            generation = currentGeneration()
+            workers = self._workers
+            if workers is not None and generation != workers.generation:
+                # The workers do not know the new registrations
+                retired, workers = workers, None
+            if workers is None:
+                workers = self._workers = _Workers(self.processes, generation)
+        if retired is not None:
+            # Other threads may still wait for texts rendered by the old
+            # workers, so let them finish
+            retired.pool.close()
+        return workers
+
+    def _retire(self, workers):
+        """Stop using workers that might be stuck."""
+        with self._lock:
+            if self._workers is workers:
+                self._workers = None
+        # The processes are stopped once the pool is not referenced anymore;
+        # other threads still get their texts from it.
+        workers.pool.close()
+
+    def close(self):
+        """Stop all worker processes.
+
+        The pool can still be used afterwards; new workers are started when
+        needed.
+        """
+        with self._lock:
+            workers, self._workers = self._workers, None
+        if workers is not None:
+            workers.pool.close()
+            workers.pool.join()
+
+    def _submit(self, workers, item):
+        """Submit a (text, format) item.
+
+        Returns the asynchronous result, the submission time and the time
+        after which the worker is considered stuck.
+        """
+        def finished(result):
+            with self._lock:
+                workers.queued -= 1
+
+        with self._lock:
+            queued = workers.queued
+            workers.queued += 1
+        # Every text ahead of this one takes at most its budget
+        waves = queued // self.processes + 1
+        submitted = time.perf_counter()
+        deadline = submitted + waves * self.budget + GRACE_PERIOD
+        result = workers.pool.apply_async(
+            _renderInWorker, item + (self.budget,),
+            callback=finished, error_callback=finished)
+        return result, submitted, deadline
+
+    def _renderItems(self, items, module):
+        """Render a list of (text, format) tuples of preprocessed texts."""
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return [_render(text, format) for text, format in items]
+        # Modules might be passed as objects
+        module = getattr(module, '__name__', module)
+        workers = self._getWorkers()
+        pending = [self._submit(workers, item) for item in items]
+        results = []
+        for (text, format), (result, submitted, deadline) in zip(
+                items, pending):
+            try:
+                html, seconds = result.get(
+                    max(deadline - time.perf_counter(), 0))
+            except multiprocessing.TimeoutError:
+                # The worker could not even be interrupted; new texts are
+                # sent to new workers
+                self._retire(workers)
+                html, seconds = None, time.perf_counter() - submitted
+            except _Timeout:
+                # The budget ran out while the worker was finishing up
+                html, seconds = None, self.budget
+            if html is None:
+                self.slowDocstrings.append(
+                    (module, getTextHash(text), seconds))
+                html = renderFallback(text)
+            results.append(html)
+        return results
+
+    def renderPreprocessed(self, text, format, module=None):
+        """Render a text already prepared by `preprocessText()`."""
+        return self._renderItems([(text, format)], module)[0]
+
+    def renderTexts(self, texts, module=None, format=None, dedent=True):
+        """Render several texts of a module in parallel.
+
+        Returns the list of the HTML of all texts. The render cache is used
+        like in `renderText()`.
+        """
+        cache = getRenderCache()
+        results = [''] * len(texts)
+        positions = []
+        items = []
+        for position, text in enumerate(texts):
+            if not text:
+                continue
+            text, textFormat = preprocessText(text, module, format, dedent)
+            if cache is not None:
+                results[position] = cache.get(text, textFormat)
+                if results[position] is not None:
+                    continue
+            positions.append(position)
+            items.append((text, textFormat))
+        for position, (text, textFormat), rendered in zip(
+                positions, items, self._renderItems(items, module)):
+            results[position] = rendered
+            if cache is not None and \
+                    not getattr(rendered, 'isFallback', False):
+                cache.set(text, textFormat, rendered)
+        return results
@@ -0,0 +1,300 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Full-Text Search Index over API Documentation
+"""
+import bisect
+import html
+import math
+import re
+
+from zope.interface.interfaces import IInterface
+from zope.schema.interfaces import IField
+from zope.testing.cleanup import addCleanUp
+
+from zope.apidoc.classregistry import getClassRegistry
+from zope.apidoc.interface import getElements
+from zope.apidoc.utilities import getPythonPath
+from zope.apidoc.utilities import renderText
+
+
+FORMAT_MAGIC = b'APIDOCIX\x01'
+
+_tag_re = re.compile(r'<[^>]*>')
+_word_re = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Return the lower-cased words of a text, ignoring any HTML markup."""
+    text = html.unescape(_tag_re.sub(' ', text))
+    return [word.lower() for word in _word_re.findall(text)]
+
+
+def _writeNumber(write, number):
+    """Write a non-negative integer as variable-length quantity."""
+    while number >= 0x80:
+        write(bytes(((number & 0x7f) | 0x80,)))
+        number >>= 7
+    write(bytes((number,)))
+
+
+def _writeString(write, string):
+    data = string.encode('utf-8')
+    _writeNumber(write, len(data))
+    write(data)
+
+
+def _readNumber(read):
+    number = shift = 0
+    while True:
+        data = read(1)
+        if not data:
+            raise ValueError('unexpected end of index data')
+        byte = data[0]
+        number |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return number
+        shift += 7
+
+
+def _readString(read):
+    length = _readNumber(read)
+    data = read(length)
+    if len(data) != length:
+        raise ValueError('unexpected end of index data')
+    return data.decode('utf-8')
+
+
+class SearchIndex:
+    """An inverted index over documentation texts.
+
+    Documents are identified by a name; for interfaces and classes, the name
+    is the URL path used by the API doctool, for example
+    ``Interface/zope.interface.Interface`` or ``Code/zope/apidoc/Class``.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Remove all documents from the index."""
+        # name -> document id
+        self._docids = {}
+        # document id -> name; removed documents are set to `None`
+        self._names = []
+        # document id -> amount of words in the document
+        self._lengths = []
+        # document id -> set of terms in the document
+        self._docTerms = []
+        # term -> {document id: frequency}
+        self._postings = {}
+        # Sorted list of all terms; computed on demand for prefix queries
+        self._sortedTerms = None
+
+    def __len__(self):
+        return len(self._docids)
+
+    def __contains__(self, name):
+        return name in self._docids
+
+    def indexDocument(self, name, text):
+        """Index the text under the given document name.
+
+        If the document was indexed before, its old text is replaced.
+        """
+        self.unindexDocument(name)
+        words = tokenize(text)
+        frequencies = {}
+        for word in words:
+            frequencies[word] = frequencies.get(word, 0) + 1
+        self._addDocument(name, len(words), frequencies)
+
+    def _addDocument(self, name, length, frequencies):
+        docid = len(self._names)
+        self._docids[name] = docid
+        self._names.append(name)
+        self._lengths.append(length)
+        self._docTerms.append(set(frequencies))
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._sortedTerms = None
+            postings[docid] = frequency
+
+    def unindexDocument(self, name):
+        """Remove a document from the index; unknown names are ignored."""
+        docid = self._docids.pop(name, None)
+        if docid is None:
+            return
+        for term in self._docTerms[docid]:
+            postings = self._postings[term]
+            del postings[docid]
+            if not postings:
+                del self._postings[term]
+                self._sortedTerms = None
+        self._names[docid] = None
+        self._docTerms[docid] = set()
+
+    def indexInterface(self, iface):
+        """Index the documentation of an interface and all its elements."""
+        module = iface.__module__
+        texts = [iface.getName(), renderText(iface.getDoc() or '', module)]
+        for name, element in getElements(iface).items():
+            texts.append(name)
+            if IField.providedBy(element):
+                # The field's documentation contains generated reference
+                # information, so only use its title and description
+                texts.append(element.title or '')
+                texts.append(renderText(element.description or '', module))
+            else:
+                texts.append(renderText(element.getDoc() or '', module))
+        self.indexDocument('Interface/' + getPythonPath(iface),
+                           '\n'.join(texts))
+
+    def indexClassRegistry(self, registry=None):
+        """Index the paths of all classes in the class registry.
+
+        By default, the registry returned by `getClassRegistry()` is used.
+        """
+        if registry is None:
+            registry = getClassRegistry()
+        for path in list(registry.keys()):
+            self.indexDocument('Code/' + path.replace('.', '/'), path)
+
+    def _getQueryTerms(self, query):
+        """Return the index terms matching the words of a query."""
+        terms = []
+        for word in query.split():
+            # Split the word like the documents, keeping the prefix marker
+            # on its last part
+            prefix = word.endswith('*')
+            parts = tokenize(word.rstrip('*'))
+            for i, part in enumerate(parts):
+                if prefix and i == len(parts) - 1:
+                    terms.extend(self._getPrefixTerms(part))
+                elif part in self._postings:
+                    terms.append(part)
+        return terms
+
+    def _getPrefixTerms(self, prefix):
+        if self._sortedTerms is None:
+            self._sortedTerms = sorted(self._postings)
+        terms = []
+        index = bisect.bisect_left(self._sortedTerms, prefix)
+        for term in self._sortedTerms[index:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query):
+        """Return a list of (name, score) tuples matching the query.
+
+        The query is a list of words separated by whitespace, which are split
+        into terms like the indexed texts, so dotted paths and punctuation
+        are fine. Words ending in ``*`` match all terms starting with the
+        word. Documents matching
+        any of the words are returned, ordered by descending relevance. Terms
+        occurring in few documents weigh more and long documents are
+        penalized.
+        """
+        total = len(self._docids)
+        scores = {}
+        for term in self._getQueryTerms(query):
+            postings = self._postings[term]
+            idf = math.log(1 + total / len(postings))
+            for docid, frequency in postings.items():
+                score = ((1 + math.log(frequency)) * idf /
+                         math.sqrt(self._lengths[docid]))
+                scores[docid] = scores.get(docid, 0) + score
+        result = [(self._names[docid], score)
+                  for docid, score in scores.items()]
+        result.sort(key=lambda item: (-item[1], item[0]))
+        return result
+
+    def save(self, file):
+        """Write the index to a binary file object.
+
+        Document ids are renumbered, so that removed documents take no space,
+        and the ids in each postings list are stored as deltas.
+        """
+        write = file.write
+        write(FORMAT_MAGIC)
+        docids = {}
+        _writeNumber(write, len(self._docids))
+        for docid, name in enumerate(self._names):
+            if name is None:
+                continue
+            docids[docid] = len(docids)
+            _writeString(write, name)
+            _writeNumber(write, self._lengths[docid])
+        _writeNumber(write, len(self._postings))
+        for term in sorted(self._postings):
+            _writeString(write, term)
+            postings = sorted((docids[docid], frequency)
+                              for docid, frequency
+                              in self._postings[term].items())
+            _writeNumber(write, len(postings))
+            previous = 0
+            for docid, frequency in postings:
+                _writeNumber(write, docid - previous)
+                _writeNumber(write, frequency)
+                previous = docid
+
+    @classmethod
+    def load(cls, file):
+        """Read an index written by `save()` from a binary file object."""
+        read = file.read
+        if read(len(FORMAT_MAGIC)) != FORMAT_MAGIC:
+            raise ValueError('not an API documentation search index')
+        index = cls()
+        for docid in range(_readNumber(read)):
+            name = _readString(read)
+            index._docids[name] = docid
+            index._names.append(name)
+            index._lengths.append(_readNumber(read))
+            index._docTerms.append(set())
+        terms = []
+        for i in range(_readNumber(read)):
+            term = _readString(read)
+            terms.append(term)
+            postings = index._postings[term] = {}
+            docid = 0
+            for j in range(_readNumber(read)):
+                docid += _readNumber(read)
+                postings[docid] = _readNumber(read)
+                index._docTerms[docid].add(term)
+        index._sortedTerms = terms
+        return index
+
+
+searchIndex = SearchIndex()
+
+
+def cleanUp():
+    searchIndex.clear()
+
+
+addCleanUp(cleanUp)
+
+
+def indexRegisteredInterface(event):
+    """Index interfaces registered as utilities in the global search index.
+
+    This function can be registered as handler for `IRegistered` events, so
+    that the index is updated whenever an interface is added.
+    """
+    component = getattr(event.object, 'component', None)
+    if IInterface.providedBy(component):
+        searchIndex.indexInterface(component)
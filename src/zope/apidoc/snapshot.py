@@ -0,0 +1,124 @@
+##############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Immutable Registry Snapshots
+"""
+import weakref
+
+from zope.component import getGlobalSiteManager
+from zope.testing.cleanup import addCleanUp
+
+from zope.apidoc.classregistry import getClassRegistry
+from zope.apidoc.generation import currentGeneration
+
+
+# Amount of attempts to copy the registries, while other threads change them
+MAX_ATTEMPTS = 10
+
+_snapshot = None
+
+
+def cleanUp():
+    global _snapshot
+    _snapshot = None
+
+
+addCleanUp(cleanUp)
+
+
+class RegistrySnapshot:
+    """A point-in-time copy of the registrations and the class registry.
+
+    All data is stored in tuples and the snapshot cannot be modified, so it
+    can be shared by many threads without locking.
+
+    The classes are only referenced weakly, so that the snapshot does not
+    keep classes alive that a `WeakClassRegistry` has given up.
+    """
+
+    __slots__ = ('generation', 'adapters', 'subscriptionAdapters',
+                 'handlers', 'utilities', '_classes')
+
+    def __init__(self, generation, adapters, subscriptionAdapters, handlers,
+                 utilities, classes):
+        set = super().__setattr__
+        set('generation', generation)
+        set('adapters', tuple(adapters))
+        set('subscriptionAdapters', tuple(subscriptionAdapters))
+        set('handlers', tuple(handlers))
+        set('utilities', tuple(utilities))
+        set('_classes', tuple((path, weakref.ref(klass))
+                              for path, klass in classes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('registry snapshots cannot be modified')
+
+    def __delattr__(self, name):
+        raise AttributeError('registry snapshots cannot be modified')
+
+    @property
+    def classes(self):
+        """A tuple of the (path, class) items of the classes still alive."""
+        classes = []
+        for path, ref in self._classes:
+            klass = ref()
+            if klass is not None:
+                classes.append((path, klass))
+        return tuple(classes)
+
+    def getClassesThatImplement(self, iface):
+        """Return all (path, class) items that implement iface."""
+        return [(path, klass) for path, klass in self.classes
+                if iface.implementedBy(klass)]
+
+
+def _copyRegistries(generation):
+    gsm = getGlobalSiteManager()
+    return RegistrySnapshot(
+        generation,
+        gsm.registeredAdapters(),
+        gsm.registeredSubscriptionAdapters(),
+        gsm.registeredHandlers(),
+        gsm.registeredUtilities(),
+        list(getClassRegistry().items()))
+
+
+def getSnapshot():
+    """Return the snapshot of the current registry generation.
+
+    A new snapshot is only built, when the generation has changed. Callers
+    that need consistent results across several queries should keep the
+    returned snapshot.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    generation = currentGeneration()
+    if snapshot is not None and snapshot.generation == generation:
+        return snapshot
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            snapshot = _copyRegistries(generation)
+        except RuntimeError:
+            # A registry changed size while it was copied
+            snapshot = None
+        newGeneration = currentGeneration()
+        if snapshot is not None and newGeneration == generation:
+            # Replacing the global reference is atomic; threads still using
+            # the previous snapshot are not affected.
+            _snapshot = snapshot
+            return snapshot
+        generation = newGeneration
+    if snapshot is None:
+        raise RuntimeError('the registries changed while they were copied')
+    # The registries keep changing; return the last copy without keeping it
+    return snapshot
@@ -15,21 +15,17 @@
 """
 __docformat__ = 'restructuredtext'
 import inspect
+import os
 import re
 import sys
+import threading
 import types
+import weakref
 from os.path import dirname
 
 import zope.i18nmessageid
-from zope.component import createObject
-from zope.component import getMultiAdapter
 from zope.interface import implementedBy
-from zope.publisher.browser import TestRequest
-from zope.security.checker import Global
-from zope.security.checker import getCheckerForInstancesOf
-from zope.security.interfaces import INameBasedChecker
-from zope.security.proxy import isinstance
-from zope.security.proxy import removeSecurityProxy
+from zope.testing.cleanup import addCleanUp
 
 from zope.apidoc.classregistry import IGNORE_MODULES
 from zope.apidoc.classregistry import safe_import
@@ -46,6 +42,52 @@ _marker = object()
 
 BASEDIR = dirname(dirname(dirname(dirname(zope.apidoc.__file__))))
 
+# Public attribute names of classes, as determined by static introspection
+_publicAttributesCache = weakref.WeakKeyDictionary()
+
+# Signatures of functions and of the functions underlying bound methods
+_functionSignatureCache = weakref.WeakKeyDictionary()
+_methodSignatureCache = weakref.WeakKeyDictionary()
+
+# Renderer source ids, keyed by module name
+_docFormatCache = {}
+
+# Persistent cache of rendered texts; see `zope.apidoc.rendercache`
+_renderCache = None
+
+# Pool of worker processes rendering texts; see `zope.apidoc.renderpool`
+_renderPool = None
+
+# Line offset indexes of source files, keyed by path, in the order they were
+# built. Every index keeps a copy of its file in memory.
+_lineIndexes = {}
+_lineIndexesLock = threading.Lock()
+MAX_LINE_INDEXES = 100
+
+
+def cleanUp():
+    _publicAttributesCache.clear()
+    _functionSignatureCache.clear()
+    _methodSignatureCache.clear()
+    _docFormatCache.clear()
+    setRenderCache(None)
+    setRenderPool(None)
+    with _lineIndexesLock:
+        _lineIndexes.clear()
+
+
+addCleanUp(cleanUp)
+
+
+# Importing `zope.security`, `zope.publisher` and `zope.component` is
+# expensive, so they are only imported when they are needed. This keeps
+# tools that only use the interface or class registry helpers fast to start.
+
+def removeSecurityProxy(obj):
+    """Return the object without its security proxy."""
+    from zope.security.proxy import removeSecurityProxy
+    return removeSecurityProxy(obj)
+
 
 def relativizePath(path):
     return path.replace(BASEDIR, 'Zope3')
@@ -59,6 +101,79 @@ def truncateSysPath(path):
     return path
 
 
+class _LineIndex:
+    """The contents of a file together with the offsets of its lines.
+
+    The file is read completely instead of being mapped into memory: reading
+    a mapping of a file that was truncated meanwhile kills the process.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.mtime = stat.st_mtime_ns
+            self.data = file.read()
+        # The file might have changed since the stat call
+        self.size = len(self.data)
+        offsets = [0]
+        find = self.data.find
+        position = find(b'\n')
+        while position != -1:
+            offsets.append(position + 1)
+            position = find(b'\n', position + 1)
+        self.offsets = offsets
+
+    def isCurrent(self, stat):
+        return (self.mtime, self.size) == (stat.st_mtime_ns, stat.st_size)
+
+    def getLines(self, first, last):
+        """Return the lines `first` to `last` (starting at 1) as text."""
+        offsets = self.offsets
+        start = offsets[min(max(first, 1), len(offsets)) - 1]
+        end = offsets[last] if last < len(offsets) else self.size
+        text = self.data[start:end].decode('utf-8', 'replace')
+        return text.splitlines(True)
+
+
+def _getLineIndex(path):
+    stat = os.stat(path)
+    index = _lineIndexes.get(path)
+    if index is not None and index.isCurrent(stat):
+        return index
+    index = _LineIndex(path)
+    with _lineIndexesLock:
+        # Other threads may still read replaced and evicted indexes
+        _lineIndexes.pop(path, None)
+        while len(_lineIndexes) >= MAX_LINE_INDEXES:
+            del _lineIndexes[next(iter(_lineIndexes))]
+        _lineIndexes[path] = index
+    return index
+
+
+def getFileSnippet(path, line, column, eline, ecolumn):
+    """Return the text of a file between two positions.
+
+    Lines start at 1 and columns at 0, like in the parser information of
+    configuration directives. If the end position points to the start of an
+    end tag, the complete tag is included. The lines of every file are
+    indexed only once, until the file is modified.
+    """
+    lines = _getLineIndex(path).getLines(line, eline)
+    if not lines:
+        return ''
+    if lines[-1][ecolumn:ecolumn + 2] == '</':
+        # We're pointing to the start of an end tag. Try to find the end
+        end = lines[-1].find('>', ecolumn)
+        if end >= 0:
+            lines[-1] = lines[-1][:end + 1]
+    else:
+        lines[-1] = lines[-1][:ecolumn + 1]
+    # Remove text before the start, if it is not whitespace
+    if lines[0][:column].strip():
+        lines[0] = lines[0][column:]
+    return ''.join(lines)
+
+
 def getPythonPath(obj):
     """Return the path of the object in standard Python notation.
 
@@ -125,6 +240,8 @@ def isReferencable(path):
 
 
 def _evalId(id):
+    from zope.security.checker import Global
+    from zope.security.proxy import isinstance
     if isinstance(id, Global):
         id = id.__name__
         if id == 'CheckerPublic':
@@ -134,6 +251,8 @@ def _evalId(id):
 
 def getPermissionIds(name, checker=_marker, klass=_marker):
     """Get the permissions of an attribute."""
+    from zope.security.checker import getCheckerForInstancesOf
+    from zope.security.interfaces import INameBasedChecker
     assert (klass is _marker) != (checker is _marker)
     entry = {}
 
@@ -152,16 +271,91 @@ def getPermissionIds(name, checker=_marker, klass=_marker):
 
 
 def getFunctionSignature(func):
-    """Return the signature of a function or method."""
+    """Return the signature of a function or method.
+
+    Signatures are cached for the lifetime of the function.
+    """
+    func = removeSecurityProxy(func)
     if not isinstance(func, (types.FunctionType, types.MethodType)):
         raise TypeError("func must be a function or method")
+    # Bound methods are created on every attribute access, so we cache the
+    # signature using the underlying function instead.
+    if isinstance(func, types.MethodType):
+        cache, key = _methodSignatureCache, func.__func__
+    else:
+        cache, key = _functionSignatureCache, func
+    try:
+        return cache[key]
+    except (KeyError, TypeError):
+        pass
+
     result = str(inspect.signature(func))
     result = result.replace("(self)", "()").replace("(self, ", '(')
+
+    try:
+        cache[key] = result
+    except TypeError:
+        pass
     return result
 
 
-def getPublicAttributes(obj):
-    """Return a list of public attribute names."""
+def getFunctionSignatures(klass):
+    """Return a dictionary of the signatures of all public methods of a
+    class."""
+    klass = removeSecurityProxy(klass)
+    signatures = {}
+    for name in _getStaticPublicAttributes(klass):
+        attr = inspect.getattr_static(klass, name)
+        if isinstance(attr, classmethod):
+            attr = attr.__get__(None, klass)
+        elif isinstance(attr, staticmethod):
+            attr = attr.__func__
+        if isinstance(attr, (types.FunctionType, types.MethodType)):
+            signatures[name] = getFunctionSignature(attr)
+    return signatures
+
+
+def _getStaticPublicAttributes(klass):
+    """Return the public attribute names of a class without invoking any
+    descriptors."""
+    try:
+        return _publicAttributesCache[klass]
+    except (KeyError, TypeError):
+        pass
+
+    attrs = tuple(
+        attr for attr in dir(klass)
+        if not attr.startswith('_') and
+        inspect.getattr_static(klass, attr, _marker) is not _marker)
+
+    try:
+        _publicAttributesCache[klass] = attrs
+    except TypeError:
+        # The class cannot be weakly referenced, so we cannot cache it.
+        pass
+    return attrs
+
+
+def getPublicAttributes(obj, static=False):
+    """Return a list of public attribute names.
+
+    If `static` is true, the attributes are looked up using
+    `inspect.getattr_static()`, so that no properties or other descriptors
+    are triggered. The result for the object's class is cached.
+    """
+    if static:
+        naked = removeSecurityProxy(obj)
+        if isinstance(naked, type):
+            return list(_getStaticPublicAttributes(naked))
+        attrs = set(_getStaticPublicAttributes(type(naked)))
+        try:
+            instance_dict = object.__getattribute__(naked, '__dict__')
+        except AttributeError:
+            instance_dict = {}
+        attrs.update(attr for attr in instance_dict
+                     if isinstance(attr, str) and not attr.startswith('_'))
+        return sorted(attrs)
+
     attrs = []
     for attr in dir(obj):
         if attr.startswith('_'):
@@ -243,32 +437,135 @@ def getDocFormat(module):
     return _format_dict.get(format, 'zope.source.stx')
 
 
+def resolveDocFormat(module):
+    """Return the renderer source id for a module or a module's dotted name.
+
+    The result is cached per module name.
+    """
+    if isinstance(module, str):
+        name = module
+        module = sys.modules.get(name, None)
+    elif isinstance(module, types.ModuleType):
+        name = module.__name__
+    else:
+        return getDocFormat(module)
+
+    try:
+        return _docFormatCache[name]
+    except KeyError:
+        pass
+    format = getDocFormat(module)
+    # Unknown modules might still be imported later on.
+    if module is not None:
+        _docFormatCache[name] = format
+    return format
+
+
 def dedentString(text):
     """Dedent the docstring, so that docutils can correctly render it."""
     dedent = min([len(match) for match in space_re.findall(text)] or [0])
-    return re.compile('\n {%i}' % dedent, re.M).sub('\n', text)
+    if not dedent:
+        return text
+    prefix = ' ' * dedent
+    lines = text.split('\n')
+    return '\n'.join(
+        lines[:1] + [line[dedent:] if line.startswith(prefix) else line
+                     for line in lines[1:]])
 
 
-def renderText(text, module=None, format=None, dedent=True):
-    if not text:
-        return ''
+def preprocessText(text, module=None, format=None, dedent=True):
+    """Prepare a text for rendering.
 
-    if module is not None:
-        if isinstance(module, str):
-            module = sys.modules.get(module, None)
-        if format is None:
-            format = getDocFormat(module)
+    Returns a tuple of the decoded and dedented text and the renderer source
+    id to use.
+    """
+    if module is not None and format is None:
+        format = resolveDocFormat(module)
 
     if format is None:
         format = 'zope.source.rest'
 
     assert format in _format_dict.values()
 
-    text = dedentString(text)
-
     if not isinstance(text, str):
         text = text.decode('latin-1', 'replace')
-    source = createObject(format, text)
+    if dedent:
+        text = dedentString(text)
+    return text, format
+
+
+def preprocessTexts(texts, module=None, format=None, dedent=True):
+    """Prepare an iterable of texts for rendering.
+
+    This is a generator yielding the same tuples as `preprocessText()`; the
+    format is only determined once for all texts.
+    """
+    if module is not None and format is None:
+        format = resolveDocFormat(module)
+    for text in texts:
+        yield preprocessText(text or '', format=format, dedent=dedent)
+
+
+def setRenderCache(cache):
+    """Set the cache used by `renderText()`; ``None`` disables caching.
+
+    The cache must provide ``get(text, format)`` and
+    ``set(text, format, html)`` methods.
+    """
+    global _renderCache
+    _renderCache = cache
+
+
+def getRenderCache():
+    """Return the cache used by `renderText()` or ``None``."""
+    return _renderCache
 
+
+def setRenderPool(pool):
+    """Set the worker pool used by `renderText()`; ``None`` renders in the
+    calling process.
+
+    The pool must provide a ``renderPreprocessed(text, format, module)``
+    method.
+    """
+    global _renderPool
+    _renderPool = pool
+
+
+def getRenderPool():
+    """Return the worker pool used by `renderText()` or ``None``."""
+    return _renderPool
+
+
+def _render(text, format):
+    from zope.component import createObject
+    from zope.component import getMultiAdapter
+    from zope.publisher.browser import TestRequest
+    source = createObject(format, text)
     renderer = getMultiAdapter((source, TestRequest()))
     return renderer.render()
+
+
+def renderText(text, module=None, format=None, dedent=True):
+    if not text:
+        return ''
+
+    text, format = preprocessText(text, module, format, dedent)
+
+    cache = _renderCache
+    if cache is not None:
+        html = cache.get(text, format)
+        if html is not None:
+            return html
+
+    pool = _renderPool
+    if pool is None:
+        html = _render(text, format)
+    else:
+        html = pool.renderPreprocessed(text, format, module)
+
+    # Fallbacks of texts that took too long to render are not cached, so
+    # that they are rendered again later
+    if cache is not None and not getattr(html, 'isFallback', False):
+        cache.set(text, format, html)
+    return html